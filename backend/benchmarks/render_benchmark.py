@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Round Rendering Benchmark
+Measures thumbnail + timelapse rendering throughput, single core and across a process pool.
+
+Usage (from the backend directory):
+  python benchmarks/render_benchmark.py [rounds] [strokes_per_round]
+"""
+
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.rendering import CANVAS_WIDTH, CANVAS_HEIGHT, render_round  # noqa: E402
+
+COLORS = ['#000000', '#FF0000', '#00FF00', '#0000FF', '#FFA500', '#800080']
+
+
+def make_round(stroke_count: int, seed: int):
+    """Generate a synthetic stroke log resembling a freehand drawing"""
+    rng = random.Random(seed)
+    strokes = []
+    for _ in range(stroke_count):
+        x, y = rng.uniform(0, CANVAS_WIDTH), rng.uniform(0, CANVAS_HEIGHT)
+        points = []
+        for _ in range(rng.randint(20, 80)):
+            x = min(max(x + rng.uniform(-8, 8), 0), CANVAS_WIDTH)
+            y = min(max(y + rng.uniform(-8, 8), 0), CANVAS_HEIGHT)
+            points.append({"x": x, "y": y})
+        strokes.append({
+            "points": points,
+            "color": rng.choice(COLORS),
+            "width": rng.choice([2, 3, 5, 8]),
+        })
+    return strokes
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    stroke_count = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    workers = os.cpu_count() or 1
+    logs = [make_round(stroke_count, seed) for seed in range(rounds)]
+
+    print(f"📊 {rounds} rounds x {stroke_count} strokes, {workers} cores")
+
+    start = time.perf_counter()
+    for strokes in logs:
+        render_round(strokes)
+    serial = time.perf_counter() - start
+    print(f"   single core: {rounds / serial:.2f} rounds/s ({serial / rounds * 1000:.1f} ms/round)")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm the pool so worker start-up is not counted
+        list(executor.map(render_round, logs[:workers]))
+        start = time.perf_counter()
+        list(executor.map(render_round, logs))
+        pooled = time.perf_counter() - start
+    print(f"   pool:        {rounds / pooled:.2f} rounds/s, {rounds / pooled / workers:.2f} rounds/s/core")
+
+
+if __name__ == "__main__":
+    main()
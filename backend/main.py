@@ -1,9 +1,13 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse
 from typing import Dict, List, Optional
 import json
 import asyncio
+import hmac
+import os
+import re
+import threading
 import uuid
 from datetime import datetime
 import logging
@@ -11,6 +15,10 @@ import logging
 from models.game import Game, Player, GameState, DrawingStroke
 from models.websocket import ConnectionManager
 from utils.words import get_random_word, get_word_list
+from utils.rendering import RenderManager, ARTIFACT_KINDS, MAX_ROUND_POINTS
+from utils.leaderboard import Leaderboard
+from utils.diagnostics import SamplingProfiler, TaskTracker, SlowPathTracer
+from utils.inbound import InboundController
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,7 +37,44 @@ app.add_middleware(
 
 # Global game state
 games: Dict[str, Game] = {}
-connection_manager = ConnectionManager()
+slow_path_tracer = SlowPathTracer(threshold_ms=float(os.getenv("SLOW_PATH_THRESHOLD_MS", "100")))
+task_tracker = TaskTracker()
+profiler = SamplingProfiler()
+event_loop_thread: Optional[int] = None
+connection_manager = ConnectionManager(tracer=slow_path_tracer)
+render_manager = RenderManager(cache_dir=os.getenv("RENDER_CACHE_DIR", "render_cache"))
+leaderboard = Leaderboard(os.getenv("LEADERBOARD_DB", "leaderboard.db"))
+
+@app.on_event("startup")
+async def startup():
+    global event_loop_thread
+    event_loop_thread = threading.get_ident()
+    task_tracker.install(asyncio.get_running_loop())
+    await render_manager.start()
+    await leaderboard.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await render_manager.stop()
+    await leaderboard.stop()
+
+GAME_PATH = re.compile(r"^/api/games/([^/]+)")
+
+@app.middleware("http")
+async def trace_slow_requests(request: Request, call_next):
+    """Log HTTP handlers that exceed the slow-path threshold"""
+    match = GAME_PATH.match(request.url.path)
+    game_id = match.group(1).lower() if match else None
+    with slow_path_tracer.trace("http", game_id, f"{request.method} {request.url.path}"):
+        return await call_next(request)
+
+def schedule_round_render(game_id: str, game: Game):
+    """Hand the finished round's stroke log to the render pool"""
+    render_manager.submit_round(
+        game_id,
+        game.round_number,
+        [stroke.dict() for stroke in game.strokes]
+    )
 
 @app.get("/")
 async def root():
@@ -129,7 +174,7 @@ async def start_game(game_id: str):
     })
     
     # Start the game timer
-    asyncio.create_task(game_timer(game_id))
+    task_tracker.spawn(game_timer(game_id), game_id, name=f"game_timer:{game_id}")
     
     logger.info(f"Started game {game_id}")
     return {"message": "Game started"}
@@ -162,7 +207,10 @@ async def make_guess(game_id: str, guess_data: dict):
     if is_correct:
         # Award points
         player.score += 10
+        # Global ranking is updated in memory; the disk write is batched
+        leaderboard.record(player.name, 10)
         game.end_round()
+        schedule_round_render(game_id, game)
         
         # Notify all clients
         await connection_manager.broadcast_to_game(game_id, {
@@ -173,7 +221,7 @@ async def make_guess(game_id: str, guess_data: dict):
         })
         
         # Start next round after delay
-        asyncio.create_task(next_round_delay(game_id))
+        task_tracker.spawn(next_round_delay(game_id), game_id, name=f"next_round_delay:{game_id}")
         
         logger.info(f"Correct guess by {player.name} in game {game_id}")
         return {"correct": True, "message": "Correct guess!"}
@@ -213,35 +261,87 @@ async def reset_game(game_id: str):
 async def websocket_endpoint(websocket: WebSocket, game_id: str, player_id: str):
     # Convert to lowercase for case-insensitive lookup
     game_id = game_id.lower()
+    # Refuse before accepting: only players who joined the game may connect, so
+    # random ids can't create rooms or counters, claim extra rate budgets and
+    # round-robin turns, or pose as the drawer
+    if game_id not in games or games[game_id].get_player(player_id) is None:
+        await websocket.close(code=1008)
+        return
+    
     await connection_manager.connect(websocket, game_id, player_id)
+    inbound.register(websocket, game_id, player_id)
+    task_tracker.tag_current_task(game_id)
     
     try:
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            # Handle different message types
-            if message["type"] == "drawing":
-                # Broadcast drawing data to other players
-                await connection_manager.broadcast_to_game(
-                    game_id, 
-                    message, 
-                    exclude_player=player_id
-                )
-            elif message["type"] == "clear_canvas":
-                # Broadcast canvas clear to other players
-                await connection_manager.broadcast_to_game(
-                    game_id, 
-                    message, 
-                    exclude_player=player_id
-                )
-            elif message["type"] == "ping":
-                # Send pong back to keep connection alive
-                await websocket.send_text(json.dumps({"type": "pong"}))
+            # Size, rate and drawer checks happen before the frame is parsed or relayed;
+            # accepted messages are handled by the room's round-robin dispatcher
+            inbound.receive(game_id, player_id, data)
+            # Yield even when frames are already buffered, so one busy socket can't hog the loop
+            await asyncio.sleep(0)
                 
     except WebSocketDisconnect:
         connection_manager.disconnect(game_id, player_id)
         logger.info(f"Player {player_id} disconnected from game {game_id}")
+    finally:
+        inbound.unregister(websocket, game_id, player_id)
+
+async def handle_ws_message(websocket: WebSocket, game_id: str, player_id: str, message: dict):
+    """Handle a single message received over a player's WebSocket"""
+    # Handle different message types
+    if message["type"] == "drawing":
+        # Keep the drawer's stroke log so the round can be rendered afterwards;
+        # once the round hits its point cap, stop parsing strokes altogether
+        game = games.get(game_id)
+        if (game and game.state == GameState.PLAYING and is_current_drawer(game_id, player_id)
+                and game.stroke_point_count < MAX_ROUND_POINTS):
+            try:
+                game.add_stroke(DrawingStroke(**message["stroke"]))
+            except Exception as e:
+                logger.warning(f"Invalid stroke from {player_id} in game {game_id}: {e}")
+        
+        # Broadcast drawing data to other players
+        await connection_manager.broadcast_to_game(
+            game_id, 
+            message, 
+            exclude_player=player_id
+        )
+    elif message["type"] == "clear_canvas":
+        game = games.get(game_id)
+        if game and game.state == GameState.PLAYING:
+            game.clear_canvas()
+        
+        # Broadcast canvas clear to other players
+        await connection_manager.broadcast_to_game(
+            game_id, 
+            message, 
+            exclude_player=player_id
+        )
+    elif message["type"] == "ping":
+        # Send pong back to keep connection alive
+        await websocket.send_text(json.dumps({"type": "pong"}))
+
+async def dispatch_ws_message(websocket: WebSocket, game_id: str, player_id: str, message: dict):
+    """Entry point for messages released by the inbound controller"""
+    with slow_path_tracer.trace("handler", game_id, message.get("type")):
+        await handle_ws_message(websocket, game_id, player_id, message)
+
+def is_current_drawer(game_id: str, player_id: str) -> bool:
+    """Check whether a player is the one currently drawing in a game"""
+    game = games.get(game_id)
+    if not game:
+        return False
+    
+    current_player = game.get_current_player()
+    return current_player is not None and current_player.id == player_id
+
+inbound = InboundController(
+    handler=dispatch_ws_message,
+    is_drawer=is_current_drawer,
+    max_frame_bytes=int(os.getenv("MAX_WS_FRAME_BYTES", "65536")),
+    spawn=task_tracker.spawn
+)
 
 # Game timer function
 async def game_timer(game_id: str):
@@ -267,6 +367,7 @@ async def game_timer(game_id: str):
     # Time's up
     if game.state == GameState.PLAYING and game.time_left <= 0:
         game.end_round()
+        schedule_round_render(game_id, game)
         
         await connection_manager.broadcast_to_game(game_id, {
             "type": "time_up",
@@ -274,7 +375,7 @@ async def game_timer(game_id: str):
         })
         
         # Start next round after delay
-        asyncio.create_task(next_round_delay(game_id))
+        task_tracker.spawn(next_round_delay(game_id), game_id, name=f"next_round_delay:{game_id}")
 
 async def next_round_delay(game_id: str):
     """Wait before starting next round"""
@@ -299,7 +400,107 @@ async def next_round_delay(game_id: str):
         })
         
         # Start timer for new round
-        asyncio.create_task(game_timer(game_id))
+        task_tracker.spawn(game_timer(game_id), game_id, name=f"game_timer:{game_id}")
+
+# Global leaderboard endpoints
+@app.get("/api/leaderboard")
+async def get_global_leaderboard(limit: int = 10, offset: int = 0):
+    """Get the top players across all games"""
+    if limit < 1 or limit > 100 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be 1-100 and offset >= 0")
+    
+    return {
+        # Players are identified by display name across games
+        "ranked_by": "name",
+        "players": leaderboard.get_top(limit, offset),
+        "total": len(leaderboard)
+    }
+
+@app.get("/api/leaderboard/{player_name}")
+async def get_player_rank(player_name: str):
+    """Get a player's global rank and score"""
+    entry = leaderboard.get_rank(player_name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Player not ranked")
+    
+    return entry
+
+# Round artifact endpoints
+@app.get("/api/games/{game_id}/rounds/{round_number}/{kind}")
+async def get_round_artifact(game_id: str, round_number: int, kind: str):
+    """Get the rendered thumbnail or timelapse of a finished round"""
+    # Convert to lowercase for case-insensitive lookup
+    game_id = game_id.lower()
+    if kind not in ARTIFACT_KINDS:
+        raise HTTPException(status_code=404, detail="Unknown artifact")
+    
+    digest, path = render_manager.get_artifact(game_id, round_number, kind)
+    if digest is None:
+        raise HTTPException(status_code=404, detail="Round not found")
+    
+    if path is None:
+        if render_manager.is_pending(digest):
+            return JSONResponse(status_code=202, content={"message": "Rendering in progress"})
+        raise HTTPException(status_code=404, detail="Render not available")
+    
+    return FileResponse(path, media_type="image/png")
+
+# Admin diagnostics endpoints
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the configured ADMIN_TOKEN"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    # Compare bytes: compare_digest rejects non-ASCII str, and headers arrive as latin-1
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.post("/admin/profiler/start", dependencies=[Depends(require_admin)])
+async def start_profiler(seconds: float = 10.0, interval_ms: float = 10.0):
+    """Sample the event loop thread for up to `seconds`"""
+    try:
+        profiler.start(seconds, interval_ms / 1000, target_thread=event_loop_thread)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return profiler.status()
+
+@app.post("/admin/profiler/stop", dependencies=[Depends(require_admin)])
+async def stop_profiler():
+    """Stop the profiler and return collapsed stacks for flamegraph tools"""
+    return PlainTextResponse(profiler.stop())
+
+@app.get("/admin/profiler", dependencies=[Depends(require_admin)])
+async def get_profiler_status():
+    """Get profiler status"""
+    return profiler.status()
+
+@app.get("/admin/tasks", dependencies=[Depends(require_admin)])
+async def get_tasks():
+    """Get running asyncio tasks with their age, grouped by room"""
+    return {"rooms": task_tracker.dump()}
+
+@app.get("/admin/slow", dependencies=[Depends(require_admin)])
+async def get_slow_paths():
+    """Get recent handlers and broadcasts that exceeded the latency threshold"""
+    return {
+        "threshold_ms": slow_path_tracer.threshold_ms,
+        "events": list(slow_path_tracer.recent)
+    }
+
+@app.get("/admin/inbound", dependencies=[Depends(require_admin)])
+async def get_inbound_stats():
+    """Get per-room counters of received, dropped and throttled WebSocket frames"""
+    return {"rooms": inbound.get_stats()}
+
+@app.post("/admin/slow/threshold", dependencies=[Depends(require_admin)])
+async def set_slow_path_threshold(ms: float):
+    """Change the slow-path latency threshold"""
+    if ms <= 0:
+        raise HTTPException(status_code=400, detail="Threshold must be positive")
+    
+    slow_path_tracer.threshold_ms = ms
+    return {"threshold_ms": ms}
 
 # Word management endpoints
 @app.get("/api/words")
@@ -314,4 +515,4 @@ async def get_random_word_endpoint():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_max_size=inbound.max_frame_bytes) 
\ No newline at end of file
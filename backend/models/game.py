@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from enum import Enum
 import uuid
 from utils.words import get_random_word
+from utils.rendering import MAX_ROUND_POINTS
 
 class GameState(Enum):
     WAITING = "waiting"
@@ -16,13 +17,13 @@ class Player(BaseModel):
     is_connected: bool = True
 
 class DrawingPoint(BaseModel):
-    x: float
-    y: float
+    x: float = Field(allow_inf_nan=False)
+    y: float = Field(allow_inf_nan=False)
 
 class DrawingStroke(BaseModel):
     points: List[DrawingPoint]
     color: str
-    width: float
+    width: float = Field(gt=0, le=20)  # Frontend brush sizes are 1-20
 
 class Game(BaseModel):
     id: str
@@ -34,6 +35,7 @@ class Game(BaseModel):
     round_number: int = 0
     max_rounds: int = 10
     strokes: List[DrawingStroke] = []
+    stroke_point_count: int = 0
 
     def add_player(self, player: Player) -> bool:
         """Add a player to the game"""
@@ -91,6 +93,7 @@ class Game(BaseModel):
         self.time_left = 60
         self.round_number += 1
         self.strokes = []
+        self.stroke_point_count = 0
 
     def end_round(self):
         """End the current round"""
@@ -114,18 +117,25 @@ class Game(BaseModel):
         self.time_left = 60
         self.round_number = 0
         self.strokes = []
+        self.stroke_point_count = 0
         
         # Reset all player scores
         for player in self.players:
             player.score = 0
 
-    def add_stroke(self, stroke: DrawingStroke):
-        """Add a drawing stroke"""
+    def add_stroke(self, stroke: DrawingStroke) -> bool:
+        """Add a drawing stroke, unless it would take the round past MAX_ROUND_POINTS"""
+        if self.stroke_point_count + len(stroke.points) > MAX_ROUND_POINTS:
+            return False
+        
         self.strokes.append(stroke)
+        self.stroke_point_count += len(stroke.points)
+        return True
 
     def clear_canvas(self):
         """Clear all drawing strokes"""
         self.strokes = []
+        self.stroke_point_count = 0
 
     def get_leaderboard(self) -> List[Player]:
         """Get players sorted by score (descending)"""
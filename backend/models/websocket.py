@@ -3,14 +3,17 @@ from typing import Dict, List, Optional
 import json
 import logging
 
+from utils.diagnostics import SlowPathTracer
+
 logger = logging.getLogger(__name__)
 
 class ConnectionManager:
     """Manages WebSocket connections for game rooms"""
     
-    def __init__(self):
+    def __init__(self, tracer: Optional[SlowPathTracer] = None):
         # game_id -> {player_id -> websocket}
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
+        self.tracer = tracer or SlowPathTracer()
 
     async def connect(self, websocket: WebSocket, game_id: str, player_id: str):
         """Accept a new WebSocket connection"""
@@ -53,15 +56,16 @@ class ConnectionManager:
 
         disconnected_players = []
         
-        for player_id, websocket in self.active_connections[game_id].items():
-            if exclude_player and player_id == exclude_player:
-                continue
-            
-            try:
-                await websocket.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Error broadcasting to {player_id}: {e}")
-                disconnected_players.append(player_id)
+        with self.tracer.trace("broadcast", game_id, message.get("type")):
+            for player_id, websocket in self.active_connections[game_id].items():
+                if exclude_player and player_id == exclude_player:
+                    continue
+                
+                try:
+                    await websocket.send_text(json.dumps(message))
+                except Exception as e:
+                    logger.error(f"Error broadcasting to {player_id}: {e}")
+                    disconnected_players.append(player_id)
 
         # Clean up disconnected players
         for player_id in disconnected_players:
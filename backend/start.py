@@ -9,6 +9,9 @@ import sys
 import uvicorn
 from pathlib import Path
 
+# Largest WebSocket frame the protocol layer will read (matches main.py's inbound check)
+WS_MAX_SIZE = int(os.getenv("MAX_WS_FRAME_BYTES", "65536"))
+
 def start_development():
     """Start the development server with hot reload"""
     print("🚀 Starting Pictionary Backend in DEVELOPMENT mode...")
@@ -22,6 +25,7 @@ def start_development():
         host="0.0.0.0",
         port=8000,
         reload=True,
+        ws_max_size=WS_MAX_SIZE,
         log_level="info"
     )
 
@@ -38,6 +42,7 @@ def start_production():
         host="0.0.0.0",
         port=8000,
         workers=4,
+        ws_max_size=WS_MAX_SIZE,
         log_level="warning"
     )
 
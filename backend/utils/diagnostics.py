@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Coroutine, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a background thread"""
+
+    MIN_INTERVAL = 0.001
+    MAX_DURATION = 120.0
+    MAX_DEPTH = 64
+    MAX_STACKS = 20000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._dropped = 0
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._duration = 0.0
+        self._interval = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.01, target_thread: Optional[int] = None):
+        """Start sampling `target_thread` (default: the caller's thread) for `seconds`"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Profiler already running")
+            self._duration = min(max(seconds, 0.0), self.MAX_DURATION)
+            self._interval = max(interval, self.MIN_INTERVAL)
+            self._stacks = Counter()
+            self._samples = 0
+            self._dropped = 0
+            self._started_at = time.monotonic()
+            self._finished_at = None
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(target_thread or threading.get_ident(),),
+                name="sampling-profiler",
+                daemon=True,
+            )
+            self._thread.start()
+        logger.info(f"Profiler started for {self._duration}s at {self._interval * 1000:.1f}ms")
+
+    def stop(self) -> str:
+        """Stop sampling (if still running) and return the collapsed stacks"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format ("a;b;c count"), as used by flamegraph tools"""
+        lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+        if self._dropped:
+            lines.append(f"[truncated] {self._dropped}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "samples": self._samples,
+            "distinct_stacks": len(self._stacks),
+            "interval_ms": self._interval * 1000,
+            "duration_seconds": self._duration,
+            "elapsed_seconds": (
+                (self._finished_at or time.monotonic()) - self._started_at
+                if self._started_at is not None else None
+            ),
+        }
+
+    def _run(self, target_thread: int):
+        deadline = time.monotonic() + self._duration
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            frame = sys._current_frames().get(target_thread)
+            if frame is None:
+                break
+            labels = []
+            while frame is not None and len(labels) < self.MAX_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            del frame
+            stack = ";".join(reversed(labels))
+            self._samples += 1
+            # Cap distinct stacks so memory stays bounded on deep/recursive code
+            if stack in self._stacks or len(self._stacks) < self.MAX_STACKS:
+                self._stacks[stack] += 1
+            else:
+                self._dropped += 1
+            self._stop_event.wait(self._interval)
+        self._finished_at = time.monotonic()
+        logger.info(f"Profiler stopped after {self._samples} samples")
+
+
+class TaskTracker:
+    """Records when asyncio tasks were created and which game room they belong to"""
+
+    def __init__(self):
+        self._created: "weakref.WeakKeyDictionary[asyncio.Task, float]" = weakref.WeakKeyDictionary()
+        self._rooms: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        """Stamp the creation time of every task created on `loop` from now on"""
+        def task_factory(loop, coro, **kwargs):
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+            self._created[task] = time.monotonic()
+            return task
+
+        loop.set_task_factory(task_factory)
+
+    def spawn(self, coro: Coroutine, game_id: str, name: Optional[str] = None) -> asyncio.Task:
+        """Create a task tagged with its game room"""
+        task = asyncio.create_task(coro, name=name)
+        self._rooms[task] = game_id
+        return task
+
+    def tag_current_task(self, game_id: str):
+        """Tag the running task (e.g. a WebSocket handler) with a game room"""
+        task = asyncio.current_task()
+        if task is not None:
+            self._rooms[task] = game_id
+
+    def dump(self) -> Dict[str, List[Dict]]:
+        """Get all running tasks, grouped by room, oldest first"""
+        now = time.monotonic()
+        rooms: Dict[str, List[Dict]] = {}
+        for task in asyncio.all_tasks():
+            created = self._created.get(task)
+            frames = task.get_stack(limit=1)
+            rooms.setdefault(self._rooms.get(task, "_untracked"), []).append({
+                "name": task.get_name(),
+                "coro": getattr(task.get_coro(), "__qualname__", repr(task.get_coro())),
+                "age_seconds": round(now - created, 3) if created is not None else None,
+                "awaiting_at": (
+                    f"{_frame_label(frames[-1])}:{frames[-1].f_lineno}" if frames else None
+                ),
+            })
+        for tasks in rooms.values():
+            tasks.sort(key=lambda t: t["age_seconds"] or 0, reverse=True)
+        return rooms
+
+
+class SlowPathTracer:
+    """Logs handlers and broadcasts that take longer than a latency threshold"""
+
+    def __init__(self, threshold_ms: float = 100.0, history: int = 200):
+        self.threshold_ms = threshold_ms
+        self.recent: deque = deque(maxlen=history)
+
+    @contextmanager
+    def trace(self, kind: str, game_id: Optional[str], message_type: Optional[str]) -> Iterator[None]:
+        """Time the enclosed block and record it if it exceeds the threshold"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self.threshold_ms:
+                self.recent.append({
+                    "timestamp": datetime.now().isoformat(),
+                    "kind": kind,
+                    "game_id": game_id,
+                    "message_type": message_type,
+                    "elapsed_ms": round(elapsed_ms, 2),
+                })
+                logger.warning(
+                    f"Slow {kind} in game {game_id} ({message_type}): {elapsed_ms:.1f}ms"
+                )
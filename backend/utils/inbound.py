@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# (tokens per second, burst size) for each message type clients may send
+DEFAULT_BUDGETS: Dict[str, Tuple[float, int]] = {
+    "drawing": (20.0, 40),
+    "clear_canvas": (1.0, 3),
+    "ping": (1.0, 3),
+}
+# Applied to every frame before it is parsed
+DEFAULT_FRAME_BUDGET: Tuple[float, int] = (40.0, 80)
+DRAWER_ONLY_TYPES = ("drawing", "clear_canvas")
+
+MessageHandler = Callable[[WebSocket, str, str, dict], Awaitable[None]]
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def consume(self) -> bool:
+        """Take one token, returning False if the bucket is empty"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class _Connection:
+    def __init__(self, websocket: WebSocket, budgets: Dict[str, Tuple[float, int]],
+                 frame_budget: Tuple[float, int], queue_size: int):
+        self.websocket = websocket
+        self.frame_bucket = TokenBucket(*frame_budget)
+        self.buckets = {kind: TokenBucket(*budget) for kind, budget in budgets.items()}
+        self.queue: Deque[dict] = deque(maxlen=queue_size)
+
+
+class _Room:
+    def __init__(self):
+        # player_id -> connection, in round-robin order
+        self.connections: Dict[str, _Connection] = {}
+        self.ready = asyncio.Event()
+        self.dispatcher: Optional[asyncio.Task] = None
+
+
+class InboundController:
+    """Admits, rate limits and fairly dispatches inbound WebSocket messages per game room"""
+
+    def __init__(
+        self,
+        handler: MessageHandler,
+        is_drawer: Callable[[str, str], bool],
+        max_frame_bytes: int = 64 * 1024,
+        queue_size: int = 32,
+        budgets: Optional[Dict[str, Tuple[float, int]]] = None,
+        frame_budget: Tuple[float, int] = DEFAULT_FRAME_BUDGET,
+        spawn: Optional[Callable[..., asyncio.Task]] = None,
+    ):
+        self.handler = handler
+        self.is_drawer = is_drawer
+        self.max_frame_bytes = max_frame_bytes
+        self.queue_size = queue_size
+        self.budgets = budgets or DEFAULT_BUDGETS
+        self.frame_budget = frame_budget
+        self._spawn = spawn
+        self.rooms: Dict[str, _Room] = {}
+        # game_id -> counters of received, dropped and throttled frames
+        self.stats: Dict[str, Counter] = {}
+
+    def register(self, websocket: WebSocket, game_id: str, player_id: str):
+        """Start accepting messages from a connection"""
+        room = self.rooms.get(game_id)
+        if room is None:
+            room = self.rooms[game_id] = _Room()
+            coro = self._dispatch(game_id, room)
+            name = f"inbound:{game_id}"
+            room.dispatcher = (
+                self._spawn(coro, game_id, name=name) if self._spawn
+                else asyncio.create_task(coro, name=name)
+            )
+        room.connections[player_id] = _Connection(
+            websocket, self.budgets, self.frame_budget, self.queue_size
+        )
+        self.stats.setdefault(game_id, Counter())
+
+    def unregister(self, websocket: WebSocket, game_id: str, player_id: str):
+        """Stop accepting messages from a connection, discarding anything queued"""
+        room = self.rooms.get(game_id)
+        if room is None:
+            return
+        conn = room.connections.get(player_id)
+        # A reconnect under the same player id may already have replaced this socket
+        if conn is None or conn.websocket is not websocket:
+            return
+        del room.connections[player_id]
+        if not room.connections:
+            room.dispatcher.cancel()
+            del self.rooms[game_id]
+
+    def receive(self, game_id: str, player_id: str, data: str) -> bool:
+        """Check a raw text frame and queue it for dispatch; returns False if it was not queued"""
+        room = self.rooms.get(game_id)
+        conn = room.connections.get(player_id) if room else None
+        if conn is None:
+            return False
+        stats = self.stats[game_id]
+        stats["frames"] += 1
+
+        # Cheap checks first so oversized or flooding frames are never parsed.
+        # uvicorn's ws_max_size rejects large frames before they are read;
+        # this is a second line of defence if that is misconfigured
+        if len(data.encode()) > self.max_frame_bytes:
+            stats["dropped_oversize"] += 1
+            return False
+        if not conn.frame_bucket.consume():
+            stats["throttled"] += 1
+            return False
+
+        try:
+            message = json.loads(data)
+            message_type = message["type"]
+        except (ValueError, TypeError, KeyError):
+            message_type = None
+        if not isinstance(message_type, str):
+            stats["dropped_invalid"] += 1
+            return False
+
+        bucket = conn.buckets.get(message_type)
+        if bucket is None:
+            stats["dropped_unknown_type"] += 1
+            return False
+        if message_type in DRAWER_ONLY_TYPES and not self.is_drawer(game_id, player_id):
+            stats["dropped_not_drawer"] += 1
+            return False
+        if not bucket.consume():
+            stats["throttled"] += 1
+            return False
+
+        if len(conn.queue) == conn.queue.maxlen:
+            # Bounded per-connection backlog: shed this frame rather than grow
+            stats["dropped_queue_full"] += 1
+            return False
+        conn.queue.append(message)
+        room.ready.set()
+        return True
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get inbound counters for every room"""
+        return {game_id: dict(counter) for game_id, counter in self.stats.items()}
+
+    async def _dispatch(self, game_id: str, room: _Room):
+        """Handle queued messages one per connection per pass, so no socket starves the others"""
+        while True:
+            await room.ready.wait()
+            handled = False
+            for player_id in list(room.connections):
+                conn = room.connections.get(player_id)
+                if conn is None or not conn.queue:
+                    continue
+                message = conn.queue.popleft()
+                handled = True
+                # Re-check at dispatch time in case the drawer changed while queued
+                if message["type"] in DRAWER_ONLY_TYPES and not self.is_drawer(game_id, player_id):
+                    self.stats[game_id]["dropped_not_drawer"] += 1
+                    continue
+                try:
+                    await self.handler(conn.websocket, game_id, player_id, message)
+                except Exception as e:
+                    logger.error(f"Error handling {message['type']} from {player_id} in game {game_id}: {e}")
+            # Nothing is awaited on an empty pass, so no message can arrive unseen here
+            if not handled:
+                room.ready.clear()
@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import queue
+import random
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sort key: highest score first, ties broken alphabetically by name
+RankKey = Tuple[int, str]
+
+
+def _rank_key(name: str, score: int) -> RankKey:
+    return -score, name
+
+
+class _SkipNode:
+    __slots__ = ("key", "forward", "span")
+
+    def __init__(self, key: Optional[RankKey], level: int):
+        self.key = key
+        self.forward: List[Optional["_SkipNode"]] = [None] * level
+        # span[i] = number of positions jumped by following forward[i]
+        self.span: List[int] = [0] * level
+
+
+class RankedSkipList:
+    """Indexable skip list giving O(log n) insert, remove, rank-of and rank lookups"""
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self.head = _SkipNode(None, self.MAX_LEVEL)
+        self.level = 1
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    @classmethod
+    def from_sorted(cls, keys: Iterator[RankKey]) -> "RankedSkipList":
+        """Build a list from keys already in ascending order in a single linear pass"""
+        skip_list = cls()
+        # Last node linked at each level, and its 1-based position
+        last: List[_SkipNode] = [skip_list.head] * cls.MAX_LEVEL
+        last_pos = [0] * cls.MAX_LEVEL
+        pos = 0
+        for key in keys:
+            pos += 1
+            level = skip_list._random_level()
+            node = _SkipNode(key, level)
+            for i in range(level):
+                last[i].forward[i] = node
+                last[i].span[i] = pos - last_pos[i]
+                last[i] = node
+                last_pos[i] = pos
+            if level > skip_list.level:
+                skip_list.level = level
+
+        # The final node at each level spans to the end of the list
+        for i in range(cls.MAX_LEVEL):
+            last[i].span[i] = pos - last_pos[i]
+        skip_list.length = pos
+        return skip_list
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self.P:
+            level += 1
+        return level
+
+    def insert(self, key: RankKey):
+        """Insert a key (keys are assumed unique)"""
+        update: List[_SkipNode] = [self.head] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        node = self.head
+        for i in reversed(range(self.level)):
+            rank[i] = 0 if i == self.level - 1 else rank[i + 1]
+            while node.forward[i] is not None and node.forward[i].key < key:
+                rank[i] += node.span[i]
+                node = node.forward[i]
+            update[i] = node
+
+        level = self._random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                rank[i] = 0
+                update[i] = self.head
+                self.head.span[i] = self.length
+            self.level = level
+
+        new_node = _SkipNode(key, level)
+        for i in range(level):
+            new_node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = new_node
+            new_node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = (rank[0] - rank[i]) + 1
+
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+        self.length += 1
+
+    def remove(self, key: RankKey) -> bool:
+        """Remove a key, returning False if it was not present"""
+        update: List[_SkipNode] = [self.head] * self.MAX_LEVEL
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.forward[i] is not None and node.forward[i].key < key:
+                node = node.forward[i]
+            update[i] = node
+
+        node = node.forward[0]
+        if node is None or node.key != key:
+            return False
+
+        for i in range(self.level):
+            if update[i].forward[i] is node:
+                update[i].span[i] += node.span[i] - 1
+                update[i].forward[i] = node.forward[i]
+            else:
+                update[i].span[i] -= 1
+
+        while self.level > 1 and self.head.forward[self.level - 1] is None:
+            self.level -= 1
+        self.length -= 1
+        return True
+
+    def rank_of(self, key: RankKey) -> Optional[int]:
+        """1-based position of a key, or None if it is not present"""
+        rank = 0
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.forward[i] is not None and node.forward[i].key <= key:
+                rank += node.span[i]
+                node = node.forward[i]
+            if node.key == key:
+                return rank
+        return None
+
+    def range(self, start: int, count: int) -> Iterator[RankKey]:
+        """Yield up to `count` keys starting at 1-based rank `start`"""
+        if start < 1 or start > self.length or count <= 0:
+            return
+        traversed = 0
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.forward[i] is not None and traversed + node.span[i] <= start:
+                traversed += node.span[i]
+                node = node.forward[i]
+            if traversed == start:
+                break
+
+        while node is not None and count > 0:
+            yield node.key
+            node = node.forward[0]
+            count -= 1
+
+
+class SQLitePool:
+    """Small fixed-size pool of SQLite connections in WAL mode"""
+
+    def __init__(self, path: str, size: int = 4):
+        self._connections: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=size)
+        for _ in range(size):
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            # WAL lets readers proceed while a batch is being written
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._connections.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for the duration of the block"""
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+class LeaderboardStore:
+    """Persistent cross-game scores"""
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.pool = SQLitePool(path, pool_size)
+        with self.pool.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leaderboard ("
+                " name TEXT PRIMARY KEY,"
+                " score INTEGER NOT NULL DEFAULT 0,"
+                " updated_at TEXT NOT NULL)"
+            )
+            conn.commit()
+
+    def load_all(self) -> List[Tuple[str, int]]:
+        """Get every (name, score) row in rank order"""
+        with self.pool.connection() as conn:
+            # Same order as the in-memory rank key (BINARY collation matches str ordering)
+            return conn.execute(
+                "SELECT name, score FROM leaderboard ORDER BY score DESC, name"
+            ).fetchall()
+
+    def apply_deltas(self, deltas: Dict[str, int]):
+        """Add a batch of score deltas in a single transaction"""
+        now = datetime.now().isoformat()
+        with self.pool.connection() as conn:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO leaderboard (name, score, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET "
+                    "score = score + excluded.score, updated_at = excluded.updated_at",
+                    [(name, delta, now) for name, delta in deltas.items()]
+                )
+
+    def close(self):
+        self.pool.close()
+
+
+class Leaderboard:
+    """Global ranking kept in memory, with score deltas written to disk in batches.
+
+    Players have no identity that outlives a game, so entries are keyed by
+    display name: everyone playing as "Player 1" shares one entry, and a
+    renamed duplicate such as "Alice (1)" gets its own.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 2.0, batch_size: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.scores: Dict[str, int] = {}
+        self.ranking = RankedSkipList()
+        self._pending: Dict[str, int] = {}
+        self._store: Optional[LeaderboardStore] = None
+        self._flush_event: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Open the store, load existing scores and start the flush loop"""
+        loop = asyncio.get_running_loop()
+        self._store = await loop.run_in_executor(None, LeaderboardStore, self.path)
+        await loop.run_in_executor(None, self._load)
+        self._flush_event = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Leaderboard loaded with {len(self.scores)} players")
+
+    async def stop(self):
+        """Stop the flush loop and write out anything still pending"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        if self._store:
+            await self.flush()
+            self._store.close()
+            self._store = None
+
+    def _load(self):
+        rows = self._store.load_all()
+        self.scores = dict(rows)
+        self.ranking = RankedSkipList.from_sorted(_rank_key(name, score) for name, score in rows)
+
+    def record(self, name: str, delta: int):
+        """Apply a score change now and queue it for persistence (never blocks)"""
+        self._set_score(name, self.scores.get(name, 0) + delta)
+        self._pending[name] = self._pending.get(name, 0) + delta
+        if self._flush_event and len(self._pending) >= self.batch_size:
+            self._flush_event.set()
+
+    def get_rank(self, name: str) -> Optional[Dict]:
+        """Get a player's 1-based rank and score"""
+        score = self.scores.get(name)
+        if score is None:
+            return None
+        return {
+            "ranked_by": "name",
+            "rank": self.ranking.rank_of(_rank_key(name, score)),
+            "name": name,
+            "score": score
+        }
+
+    def get_top(self, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """Get `limit` entries starting after `offset` places"""
+        return [
+            {"rank": offset + i + 1, "name": name, "score": -neg_score}
+            for i, (neg_score, name) in enumerate(self.ranking.range(offset + 1, limit))
+        ]
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def _set_score(self, name: str, score: int):
+        old_score = self.scores.get(name)
+        if old_score is not None:
+            self.ranking.remove(_rank_key(name, old_score))
+        self.scores[name] = score
+        self.ranking.insert(_rank_key(name, score))
+
+    async def flush(self):
+        """Write all pending deltas to disk in one batch"""
+        if not self._pending or not self._store:
+            return
+        batch, self._pending = self._pending, {}
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._store.apply_deltas, batch)
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} leaderboard updates: {e}")
+            # Merge back so the deltas are retried on the next flush
+            for name, delta in batch.items():
+                self._pending[name] = self._pending.get(name, 0) + delta
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
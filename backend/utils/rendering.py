@@ -0,0 +1,372 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Matches the <canvas width={800} height={500}> used by the frontend
+CANVAS_WIDTH = 800
+CANVAS_HEIGHT = 500
+
+THUMBNAIL_SCALE = 0.25
+TIMELAPSE_SCALE = 0.5
+TIMELAPSE_MAX_FRAMES = 40
+TIMELAPSE_FRAME_DELAY_MS = 120
+
+ARTIFACT_KINDS = ("thumbnail", "timelapse")
+
+# Strokes come from clients, so bound the work a single round can cause:
+# the frontend's brush goes up to 20px, and each raster stops drawing after
+# MAX_STAMPS discs however the points are laid out
+MAX_STROKE_WIDTH = 20
+MAX_ROUND_POINTS = 20000
+MAX_STAMPS = 100000
+
+# Bump when the rasterizer output changes so stale cache entries are ignored
+RENDER_VERSION = 2
+
+BACKGROUND = (255, 255, 255)
+Color = Tuple[int, int, int]
+
+
+def parse_color(value: str) -> Color:
+    """Parse a #rgb / #rrggbb color string, falling back to black"""
+    value = (value or "").strip().lstrip("#")
+    if len(value) == 3:
+        value = "".join(c * 2 for c in value)
+    try:
+        return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+    except ValueError:
+        return 0, 0, 0
+
+
+def _clamp(value, low: float, high: float) -> float:
+    """Clamp a client-supplied number, treating non-numbers and NaN/inf as `low`"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return low
+    if not math.isfinite(value):
+        return low
+    return min(max(value, low), high)
+
+
+def limit_strokes(strokes: List[dict], max_points: int = MAX_ROUND_POINTS) -> List[dict]:
+    """Drop strokes once the round's total point count exceeds `max_points`"""
+    limited = []
+    total = 0
+    for stroke in strokes:
+        total += len(stroke.get("points") or [])
+        if total > max_points:
+            break
+        limited.append(stroke)
+    return limited
+
+
+def stroke_log_hash(strokes: List[dict]) -> str:
+    """Content hash of a round's stroke log, used as the cache key"""
+    payload = json.dumps(
+        {"version": RENDER_VERSION, "strokes": strokes},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Raster:
+    """Minimal RGB raster with thick-line drawing"""
+
+    def __init__(self, width: int, height: int, background: Color = BACKGROUND):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(bytes(background) * (width * height))
+        self.stamp_budget = MAX_STAMPS
+        self._spans: Dict[int, List[Tuple[int, int]]] = {}
+
+    def copy(self) -> "Raster":
+        raster = Raster.__new__(Raster)
+        raster.width = self.width
+        raster.height = self.height
+        raster.pixels = bytearray(self.pixels)
+        raster.stamp_budget = self.stamp_budget
+        raster._spans = self._spans
+        return raster
+
+    def _disc_spans(self, radius: int) -> List[Tuple[int, int]]:
+        """(dy, half_width) rows making up a filled disc of the given radius"""
+        spans = self._spans.get(radius)
+        if spans is None:
+            spans = []
+            for dy in range(-radius, radius + 1):
+                half = int((radius * radius - dy * dy) ** 0.5)
+                spans.append((dy, half))
+            self._spans[radius] = spans
+        return spans
+
+    def stamp(self, cx: int, cy: int, radius: int, color: bytes):
+        """Fill a disc centred on (cx, cy)"""
+        if self.stamp_budget <= 0:
+            return
+        self.stamp_budget -= 1
+        width, height, pixels = self.width, self.height, self.pixels
+        for dy, half in self._disc_spans(radius):
+            y = cy + dy
+            if y < 0 or y >= height:
+                continue
+            x0 = max(cx - half, 0)
+            x1 = min(cx + half, width - 1)
+            if x0 > x1:
+                continue
+            start = (y * width + x0) * 3
+            pixels[start:start + (x1 - x0 + 1) * 3] = color * (x1 - x0 + 1)
+
+    def draw_stroke(self, stroke: dict, scale: float):
+        """Draw a stroke as a round-capped polyline"""
+        points = stroke.get("points") or []
+        if not points:
+            return
+        color = bytes(parse_color(str(stroke.get("color", ""))))
+        width = _clamp(stroke.get("width", 1), 1, MAX_STROKE_WIDTH)
+        radius = max(int(width * scale / 2), 0)
+        # Step at most half a radius so consecutive discs overlap
+        step = max(radius, 1) / 2
+
+        prev_x = _clamp(points[0].get("x"), 0, CANVAS_WIDTH) * scale
+        prev_y = _clamp(points[0].get("y"), 0, CANVAS_HEIGHT) * scale
+        self.stamp(int(prev_x), int(prev_y), radius, color)
+        for point in points[1:]:
+            if self.stamp_budget <= 0:
+                return
+            x = _clamp(point.get("x"), 0, CANVAS_WIDTH) * scale
+            y = _clamp(point.get("y"), 0, CANVAS_HEIGHT) * scale
+            dist = max(abs(x - prev_x), abs(y - prev_y))
+            steps = max(int(dist / step), 1)
+            dx = (x - prev_x) / steps
+            dy = (y - prev_y) / steps
+            for i in range(1, steps + 1):
+                self.stamp(int(prev_x + dx * i), int(prev_y + dy * i), radius, color)
+            prev_x, prev_y = x, y
+
+    def scanlines(self) -> bytes:
+        """Raw image data with a filter-type byte (0 = None) before each row"""
+        row = self.width * 3
+        pixels = self.pixels
+        return b"".join(
+            b"\x00" + pixels[y * row:(y + 1) * row] for y in range(self.height)
+        )
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
+
+
+def _ihdr(width: int, height: int) -> bytes:
+    # 8-bit depth, color type 2 (truecolor RGB), no interlace
+    return _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def encode_png(raster: Raster) -> bytes:
+    """Encode a raster as a PNG image"""
+    return b"".join([
+        PNG_SIGNATURE,
+        _ihdr(raster.width, raster.height),
+        _png_chunk(b"IDAT", zlib.compress(raster.scanlines(), 6)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+def encode_apng(frames: List[Raster], delay_ms: int) -> bytes:
+    """Encode full-size frames as an animated PNG that loops forever"""
+    width, height = frames[0].width, frames[0].height
+    chunks = [
+        PNG_SIGNATURE,
+        _ihdr(width, height),
+        _png_chunk(b"acTL", struct.pack(">II", len(frames), 0)),
+    ]
+    sequence = 0
+    for index, frame in enumerate(frames):
+        chunks.append(_png_chunk(b"fcTL", struct.pack(
+            ">IIIIIHHBB",
+            sequence, width, height, 0, 0,
+            delay_ms, 1000,
+            0, 0,  # dispose: none, blend: source
+        )))
+        sequence += 1
+        data = zlib.compress(frame.scanlines(), 6)
+        if index == 0:
+            # The first frame doubles as the static fallback image
+            chunks.append(_png_chunk(b"IDAT", data))
+        else:
+            chunks.append(_png_chunk(b"fdAT", struct.pack(">I", sequence) + data))
+            sequence += 1
+    chunks.append(_png_chunk(b"IEND", b""))
+    return b"".join(chunks)
+
+
+def render_thumbnail(strokes: List[dict]) -> bytes:
+    """Rasterize the final canvas of a round into a small PNG"""
+    raster = Raster(int(CANVAS_WIDTH * THUMBNAIL_SCALE), int(CANVAS_HEIGHT * THUMBNAIL_SCALE))
+    for stroke in strokes:
+        raster.draw_stroke(stroke, THUMBNAIL_SCALE)
+    return encode_png(raster)
+
+
+def render_timelapse(strokes: List[dict]) -> bytes:
+    """Rasterize a round's stroke log into an animated PNG timelapse"""
+    raster = Raster(int(CANVAS_WIDTH * TIMELAPSE_SCALE), int(CANVAS_HEIGHT * TIMELAPSE_SCALE))
+    frames = [raster.copy()]
+    # Group strokes so long rounds still fit in TIMELAPSE_MAX_FRAMES
+    per_frame = max(-(-len(strokes) // (TIMELAPSE_MAX_FRAMES - 1)), 1)
+    for i, stroke in enumerate(strokes, start=1):
+        raster.draw_stroke(stroke, TIMELAPSE_SCALE)
+        if i % per_frame == 0 or i == len(strokes):
+            frames.append(raster.copy())
+    return encode_apng(frames, TIMELAPSE_FRAME_DELAY_MS)
+
+
+def render_round(strokes: List[dict]) -> Dict[str, bytes]:
+    """Render every artifact kind for a round"""
+    strokes = limit_strokes(strokes)
+    return {
+        "thumbnail": render_thumbnail(strokes),
+        "timelapse": render_timelapse(strokes),
+    }
+
+
+def artifact_path(cache_dir: str, digest: str, kind: str) -> Path:
+    """Location of a cached artifact on disk"""
+    return Path(cache_dir) / digest[:2] / f"{digest}.{kind}.png"
+
+
+def render_to_cache(strokes: List[dict], cache_dir: str, digest: str) -> str:
+    """Render a round and write its artifacts to the cache (runs in a worker process)"""
+    for kind, data in render_round(strokes).items():
+        path = artifact_path(cache_dir, digest, kind)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        # Atomic so readers never see a half-written file
+        os.replace(tmp_path, path)
+    return digest
+
+
+class RenderManager:
+    """Renders finished rounds in a process pool and serves them from a disk cache"""
+
+    def __init__(self, cache_dir: str, max_workers: Optional[int] = None, max_queue: int = 64):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or max(min(os.cpu_count() or 1, 4), 1)
+        self.max_queue = max_queue
+        # game_id -> {round_number -> content hash}
+        self.rounds: Dict[str, Dict[int, str]] = {}
+        self._pending: set = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        """Spin up the process pool and the queue consumers"""
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        self._executor = self._create_executor()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.max_workers)
+        ]
+        logger.info(f"Render pool started with {self.max_workers} workers")
+
+    async def stop(self):
+        """Cancel the queue consumers and shut the process pool down"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn avoids forking a process that already runs an event loop
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def is_cached(self, digest: str) -> bool:
+        return all(artifact_path(self.cache_dir, digest, kind).exists() for kind in ARTIFACT_KINDS)
+
+    def submit_round(self, game_id: str, round_number: int, strokes: List[dict]) -> Optional[str]:
+        """Queue a finished round for rendering without blocking the caller"""
+        strokes = limit_strokes(strokes)
+        if not strokes:
+            return None
+
+        digest = stroke_log_hash(strokes)
+        self.rounds.setdefault(game_id, {})[round_number] = digest
+
+        if digest in self._pending or self.is_cached(digest):
+            return digest
+        if self._queue is None:
+            logger.warning(f"Render pool not running, skipping round {round_number} of game {game_id}")
+            return digest
+
+        try:
+            self._queue.put_nowait((digest, strokes))
+        except asyncio.QueueFull:
+            logger.warning(f"Render queue full, dropping round {round_number} of game {game_id}")
+            return digest
+
+        self._pending.add(digest)
+        return digest
+
+    def get_artifact(self, game_id: str, round_number: int, kind: str) -> Tuple[Optional[str], Optional[Path]]:
+        """Return (digest, path) for a round's artifact; path is None while not yet rendered"""
+        digest = self.rounds.get(game_id, {}).get(round_number)
+        if digest is None:
+            return None, None
+        path = artifact_path(self.cache_dir, digest, kind)
+        return digest, path if path.exists() else None
+
+    def is_pending(self, digest: str) -> bool:
+        return digest in self._pending
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            digest, strokes = await self._queue.get()
+            executor = self._executor
+            try:
+                await loop.run_in_executor(
+                    executor, render_to_cache, strokes, self.cache_dir, digest
+                )
+            except asyncio.CancelledError:
+                raise
+            except BrokenProcessPool as e:
+                logger.error(f"Render pool broken while rendering {digest}: {e}")
+                # A crashed worker poisons the whole pool, so replace it, but only once:
+                # the other consumers see the same error for the same pool
+                if self._executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._create_executor()
+            except Exception as e:
+                logger.error(f"Error rendering round {digest}: {e}")
+            finally:
+                self._pending.discard(digest)
+                self._queue.task_done()